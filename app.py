@@ -1,16 +1,88 @@
+import os
 import json
 import time
+import asyncio
+import functools
 import streamlit as st
-from chatbot_setup import process_records_parallel, gpt_translate_text, QuotaExceededException
+from chatbot_setup import iter_processed, gpt_translate_text, translate_records_batch, summarize_results, load_json_bytes, dump_json_bytes, get_checkpoint_path, discard_checkpoint, is_api_error_record, QuotaExceededException, APIKeyException
 
 st.set_page_config(page_title="Q/A Validator", layout="wide")
 st.title("JSON Question-Answer Validator & Fixer")
 
 # Initialize session state
-for key in ["original_data", "processed_data", "processed_en_data", "last_uploaded_file", "quota_exceeded"]:
+for key in ["original_data", "processed_data", "processed_en_data", "last_uploaded_file", "checkpoint_path", "quota_exceeded"]:
     if key not in st.session_state:
         st.session_state[key] = None
 
+# Parse uploads once per distinct file content
+@st.cache_data(show_spinner=False)
+def load_json(file_bytes: bytes):
+    return load_json_bytes(file_bytes)
+
+# Validate records, updating the UI as each one completes. Results are written
+# into `results` by position so partial progress survives a quota error.
+async def collect_with_ui(records, results, progress_bar, status_text, live_results, checkpoint_path):
+    total = len(records)
+    done = 0
+    async for idx, rec in iter_processed(records, checkpoint_path=checkpoint_path):
+        results[idx] = rec
+        done += 1
+        progress_bar.progress(int((done/total)*100))
+        status_text.text(f"Processed {done} of {total} records...")
+        live_results.json(rec, expanded=False)
+
+# Show processed records, summary and downloads; as a fragment, interacting with
+# the viewer or download buttons doesn't rerun the upload/processing part of the script
+@st.fragment
+def render_results():
+    st.subheader("✅ Processed Data")
+    with st.expander("View Processed Data", expanded=False):
+        st.json(st.session_state["processed_data"])
+
+    # Summary
+    processed = st.session_state["processed_data"]
+    valid, corrected, failed = summarize_results(processed)
+    
+    st.subheader("📊 Processing Summary")
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Total Records", len(processed))
+    with col2:
+        st.metric("Valid (No Changes)", valid, delta=None)
+    with col3:
+        st.metric("Corrected by AI", corrected, delta=None)
+    with col4:
+        st.metric("Failed/Flagged", failed, delta=None if failed == 0 else f"{failed}")
+
+    # Download buttons; data is passed as a callable so the (potentially large)
+    # payload is only serialized when the button is clicked. Streamlit runs the
+    # callable on a worker thread without session state, so the data is bound here.
+    st.subheader("📥 Download Results")
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.download_button(
+            "📄 Download Corrected JSON (Original Language)",
+            data=functools.partial(dump_json_bytes, st.session_state["processed_data"]),
+            file_name="corrected.json",
+            mime="application/json",
+            help="Download the corrected data in the original language"
+        )
+    
+    with col2:
+        if st.session_state.get("processed_en_data"):
+            st.download_button(
+                "🌐 Download Corrected JSON (English)",
+                data=functools.partial(dump_json_bytes, st.session_state["processed_en_data"]),
+                file_name="corrected_en.json",
+                mime="application/json",
+                help="Download the corrected data translated to English"
+            )
+        else:
+            st.button("🌐 English Translation Unavailable", disabled=True, 
+                     help="Translation not completed or failed due to quota limits")
+
 # Function to display quota exceeded message
 def display_quota_exceeded_message():
     st.error("🚨 **QUOTA EXCEEDED** 🚨")
@@ -39,7 +111,7 @@ def display_quota_exceeded_message():
     # Add a reset button
     if st.button("🔄 Reset Session (After Fixing Billing)", type="primary"):
         for key in st.session_state.keys():
-            if key not in ["original_data", "last_uploaded_file"]:
+            if key not in ["original_data", "last_uploaded_file", "checkpoint_path"]:
                 st.session_state[key] = None
         st.rerun()
 
@@ -48,7 +120,7 @@ uploaded = st.file_uploader("Upload JSON File", type="json")
 # Only load data on NEW upload (check if it's a different file)
 if uploaded and uploaded.name != st.session_state.get("last_uploaded_file"):
     try:
-        st.session_state["original_data"] = json.load(uploaded)
+        st.session_state["original_data"] = load_json(uploaded.getvalue())
         if isinstance(st.session_state["original_data"], dict):
             st.session_state["original_data"] = [st.session_state["original_data"]]
         # Reset processed data only on new upload
@@ -56,6 +128,7 @@ if uploaded and uploaded.name != st.session_state.get("last_uploaded_file"):
         st.session_state["processed_en_data"] = None
         st.session_state["quota_exceeded"] = None
         st.session_state["last_uploaded_file"] = uploaded.name
+        st.session_state["checkpoint_path"] = get_checkpoint_path(uploaded.getvalue())
         st.success(f"✅ Successfully loaded {len(st.session_state['original_data'])} records from {uploaded.name}")
     except json.JSONDecodeError as e:
         st.error(f"❌ Invalid JSON file: {str(e)}")
@@ -73,6 +146,17 @@ if st.session_state["original_data"]:
     with st.expander("View Original Data", expanded=False):
         st.json(st.session_state["original_data"])
 
+# Offer to throw away saved progress from an earlier, unfinished run of this file
+checkpoint_path = st.session_state.get("checkpoint_path")
+if checkpoint_path and os.path.exists(checkpoint_path) and not st.session_state["processed_data"]:
+    st.info("💾 Saved progress from an earlier run of this file will be reused.")
+    if st.button("🗑️ Discard Saved Progress", help="Validate every record again from scratch"):
+        discard_checkpoint(checkpoint_path)
+        st.rerun()
+
+use_batch_api = st.toggle("Use Batch API (cheaper, up to 24h)", value=False,
+                          help="Submit all translations as one OpenAI Batch job at half the cost")
+
 # Processing
 if st.button("🚀 Start Processing", disabled=not st.session_state.get("original_data")):
     # Only process if not already processed
@@ -84,23 +168,23 @@ if st.button("🚀 Start Processing", disabled=not st.session_state.get("origina
         progress_bar = st.progress(0)
         status_text = st.empty()
 
+        live_results = st.expander("Live Results", expanded=False)
+
         try:
             # Processing with quota exception handling
-            processed = []
-            batch_size = 5
-            for i in range(0, total, batch_size):
-                batch = st.session_state["original_data"][i:i+batch_size]
-                status_text.text(f"Processing batch {i//batch_size + 1}...")
-                
-                try:
-                    batch_results = process_records_parallel(batch, max_workers=batch_size)
-                    processed.extend(batch_results)
-                    progress_bar.progress(min(100, int((len(processed)/total)*100)))
-                    status_text.text(f"Processed {len(processed)} of {total} records...")
-                except QuotaExceededException as e:
-                    st.session_state["quota_exceeded"] = str(e)
-                    st.session_state["processed_data"] = processed  # Save partial results
-                    st.rerun()  # Reload page to show quota message
+            results = [None]*total
+            try:
+                asyncio.run(collect_with_ui(st.session_state["original_data"], results,
+                                            progress_bar, status_text, live_results,
+                                            st.session_state["checkpoint_path"]))
+            except QuotaExceededException as e:
+                st.session_state["quota_exceeded"] = str(e)
+                st.session_state["processed_data"] = [r for r in results if r is not None]  # Save partial results
+                st.rerun()  # Reload page to show quota message
+            except APIKeyException as e:
+                st.error(f"🔑 {e.message} See the API key notes at the bottom of the page.")
+                st.stop()
+            processed = results
 
             elapsed = time.time() - start_time
             st.session_state["processed_data"] = processed
@@ -113,19 +197,34 @@ if st.button("🚀 Start Processing", disabled=not st.session_state.get("origina
             
             try:
                 processed_en = []
-                for i, rec in enumerate(processed):
-                    translation_status.text(f"Translating record {i+1} of {len(processed)}...")
-                    try:
-                        translated_rec = gpt_translate_text(rec, "English")
-                        processed_en.append(translated_rec)
-                        translation_progress.progress(int(((i+1)/len(processed))*100))
-                    except QuotaExceededException as e:
-                        st.session_state["quota_exceeded"] = str(e)
-                        st.session_state["processed_en_data"] = processed_en  # Save partial translations
-                        st.rerun()  # Reload page to show quota message
+                if use_batch_api:
+                    translation_status.text("Waiting for the Batch API job to complete...")
+                    with st.spinner("Batch translation in progress..."):
+                        processed_en = translate_records_batch(processed, "English")
+                    translation_progress.progress(100)
+                else:
+                    # Show each translation as it streams in
+                    translation_preview = st.empty()
+                    for i, rec in enumerate(processed):
+                        translation_status.text(f"Translating record {i+1} of {len(processed)}...")
+                        try:
+                            translated_rec = gpt_translate_text(
+                                rec, "English", on_progress=lambda text: translation_preview.code(text, language="json")
+                            )
+                            processed_en.append(translated_rec)
+                            translation_progress.progress(int(((i+1)/len(processed))*100))
+                        except QuotaExceededException as e:
+                            st.session_state["quota_exceeded"] = str(e)
+                            st.session_state["processed_en_data"] = processed_en  # Save partial translations
+                            st.rerun()  # Reload page to show quota message
+                    translation_preview.empty()
                 
                 st.session_state["processed_en_data"] = processed_en
                 translation_status.text("✅ Translation completed!")
+                # Both outputs are stored now; keep the checkpoint only if some records
+                # still need another validation attempt
+                if not any(is_api_error_record(r) for r in processed):
+                    discard_checkpoint(st.session_state["checkpoint_path"])
                 
             except QuotaExceededException as e:
                 st.session_state["quota_exceeded"] = str(e)
@@ -142,53 +241,7 @@ if st.button("🚀 Start Processing", disabled=not st.session_state.get("origina
 
 # Show processed data if exists
 if st.session_state["processed_data"]:
-    st.subheader("✅ Processed Data")
-    with st.expander("View Processed Data", expanded=False):
-        st.json(st.session_state["processed_data"])
-
-    # Summary
-    processed = st.session_state["processed_data"]
-    valid = sum(1 for r in processed if r.get("_validation", {}).get("valid") is True)
-    corrected = sum(1 for r in processed if r.get("_validation", {}).get("corrected") is True)
-    failed = sum(1 for r in processed if not r.get("_validation", {}).get("valid", False) and not r.get("_validation", {}).get("corrected", False))
-    
-    st.subheader("📊 Processing Summary")
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.metric("Total Records", len(processed))
-    with col2:
-        st.metric("Valid (No Changes)", valid, delta=None)
-    with col3:
-        st.metric("Corrected by AI", corrected, delta=None)
-    with col4:
-        st.metric("Failed/Flagged", failed, delta=None if failed == 0 else f"{failed}")
-
-    # Download buttons
-    st.subheader("📥 Download Results")
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.download_button(
-            "📄 Download Corrected JSON (Original Language)",
-            data=json.dumps(st.session_state["processed_data"], indent=2, ensure_ascii=False),
-            file_name="corrected.json",
-            mime="application/json",
-            help="Download the corrected data in the original language"
-        )
-    
-    with col2:
-        if st.session_state.get("processed_en_data"):
-            st.download_button(
-                "🌐 Download Corrected JSON (English)",
-                data=json.dumps(st.session_state["processed_en_data"], indent=2, ensure_ascii=False),
-                file_name="corrected_en.json",
-                mime="application/json",
-                help="Download the corrected data translated to English"
-            )
-        else:
-            st.button("🌐 English Translation Unavailable", disabled=True, 
-                     help="Translation not completed or failed due to quota limits")
+    render_results()
 
 # Instructions
 if not st.session_state.get("original_data"):
@@ -227,6 +280,7 @@ with col1:
         **Rate Limit Issues:**
         - Wait a few minutes between processing batches
         - The app automatically retries after rate limit delays
+        - To throttle requests before they hit the limit, set `OPENAI_REQUESTS_PER_MINUTE` and/or `OPENAI_TOKENS_PER_MINUTE` in `.env` to your tier's per-model limits
         - Consider processing smaller files to avoid limits
         
         **Connection Problems:**
@@ -1,19 +1,74 @@
 import os
 import json
-import json5
+import re
 import unicodedata
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator, Callable
 from dotenv import load_dotenv
 import openai
-import concurrent.futures
+import tiktoken
+import streamlit as st
+from tenacity import retry, stop_after_attempt, wait_exponential_jitter, retry_if_exception
+import asyncio
+import functools
+import hashlib
+import threading
 import time
+from collections import deque
+
+# orjson is much faster on large payloads; fall back to the stdlib when it isn't installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson turns integers outside the 64-bit range into floats, so input with a run of
+# 19+ digits (possibly such an integer) is left to the stdlib, which keeps them exact
+_LONG_DIGITS = {bytes: re.compile(rb"\d{19}"), str: re.compile(r"\d{19}")}
+
+# Parse JSON from str or bytes with the stdlib's results. orjson is tried first; input
+# it rejects (e.g. NaN, which the stdlib accepts) is reparsed by json.loads, so callers
+# see json.JSONDecodeError only for input that is invalid either way.
+def load_json_bytes(data):
+    if orjson is not None and not _LONG_DIGITS[type(data)].search(data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+# Serialize to UTF-8 JSON bytes, indented unless a compact single line is wanted.
+# orjson can't encode integers beyond 64 bits; those payloads go through the stdlib.
+def dump_json_bytes(data, indent: bool = True) -> bytes:
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return orjson.dumps(data, option=option)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(data, indent=2 if indent else None, ensure_ascii=False).encode("utf-8")
 
 # Load environment variables
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 MODEL_NAME = os.getenv("OPENAI_MODEL", "gpt-4-turbo")
+# Validation tries the fast model first and escalates to the strong one on a weak answer;
+# translation always uses the fast model
+FAST_MODEL = os.getenv("OPENAI_FAST_MODEL", "gpt-4o-mini")
+STRONG_MODEL = os.getenv("OPENAI_STRONG_MODEL", MODEL_NAME)
+REQUEST_TIMEOUT = 60  # Seconds before a single API request is abandoned
+VALIDATION_MAX_TOKENS = 600
+TRANSLATION_MAX_TOKENS = 4096
+# Optional client-side rate limiting. Set these to your account tier's per-model limits
+# (OpenAI tracks RPM/TPM separately for each model, so each model gets its own budget).
+# When neither is set the limiter is off and only the retry/backoff policy applies.
+REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE") or 0) or None
+TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE") or 0) or None
 
-client = openai.OpenAI()
+# Build the OpenAI client once per process instead of on every Streamlit rerun.
+# SDK retries are disabled on every client and each call goes through api_retry instead.
+@st.cache_resource(show_spinner=False)
+def get_openai_client() -> openai.OpenAI:
+    return openai.OpenAI(max_retries=0)
 
 # Custom exception for quota exceeded
 class QuotaExceededException(Exception):
@@ -21,20 +76,149 @@ class QuotaExceededException(Exception):
         self.message = message
         super().__init__(self.message)
 
+# A RateLimitError is either a transient throttle or an exhausted account quota
+def is_quota_error(e: Exception) -> bool:
+    # Matches the insufficient_quota error code as well as plain quota messages
+    return 'quota' in str(e).lower()
+
+# Connection problems, timeouts, 5xx and non-quota 429s are worth retrying
+def is_transient_error(e: BaseException) -> bool:
+    if isinstance(e, (openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)):
+        return True
+    return isinstance(e, openai.RateLimitError) and not is_quota_error(e)
+
+# Exponential backoff with jitter for every chat completion; the last error is re-raised
+api_retry = retry(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential_jitter(initial=1, max=30),
+    retry=retry_if_exception(is_transient_error),
+    reraise=True
+)
+
+# Preemptive sliding-window limiter over requests and estimated tokens per minute,
+# so concurrent calls stay under the account tier instead of hitting 429s
+class RateLimiter:
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, window: float = 60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self._requests = deque()  # timestamps of granted requests
+        self._tokens = deque()  # (timestamp, estimated tokens) of granted requests
+        self._token_total = 0
+
+    def _evict(self, now: float) -> None:
+        while self._requests and self._requests[0] <= now - self.window:
+            self._requests.popleft()
+        while self._tokens and self._tokens[0][0] <= now - self.window:
+            self._token_total -= self._tokens.popleft()[1]
+
+    # Seconds to wait until both windows have room for est_tokens
+    def _wait_time(self, est_tokens: int, now: float) -> float:
+        self._evict(now)
+        wait = 0.0
+        if len(self._requests) >= self.requests_per_minute:
+            wait = self._requests[0] + self.window - now
+        excess = self._token_total + est_tokens - self.tokens_per_minute
+        if self._tokens and excess > 0:
+            # Wait until enough old usage expires; a request larger than the whole
+            # budget waits for an empty window and then goes through on its own
+            expiry = self._tokens[-1][0]
+            freed = 0
+            for ts, tokens in self._tokens:
+                freed += tokens
+                if freed >= excess:
+                    expiry = ts
+                    break
+            wait = max(wait, expiry + self.window - now)
+        return wait
+
+    # The check and the bookkeeping run without an await in between, so no lock is
+    # needed and the limiter can be shared across event loops
+    async def acquire(self, est_tokens: int) -> None:
+        while True:
+            now = time.monotonic()
+            wait = self._wait_time(est_tokens, now)
+            if wait <= 0:
+                self._requests.append(now)
+                self._tokens.append((now, est_tokens))
+                self._token_total += est_tokens
+                return
+            await asyncio.sleep(wait)
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+
+# One limiter per model, or None when rate limiting isn't configured
+def get_rate_limiter(model: str) -> Optional[RateLimiter]:
+    if REQUESTS_PER_MINUTE is None and TOKENS_PER_MINUTE is None:
+        return None
+    if model not in _rate_limiters:
+        _rate_limiters[model] = RateLimiter(REQUESTS_PER_MINUTE or float("inf"), TOKENS_PER_MINUTE or float("inf"))
+    return _rate_limiters[model]
+
+# Set once any request reports an exhausted quota, so pending tasks skip their API
+# call instead of spending more requests; cleared at the start of each run
+quota_exceeded_event = asyncio.Event()
+
+# Returns None when the encoding can't be loaded (tiktoken downloads it on
+# first use); cached so an offline host doesn't retry on every call
+@functools.lru_cache(maxsize=None)
+def get_encoding(model: str) -> Optional[tiktoken.Encoding]:
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+# Count the tokens in text, falling back to ~4 characters per token
+def count_tokens(model: str, text: str) -> int:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+# Estimate the tokens a request counts against TPM: prompt tokens plus max_tokens
+def estimate_tokens(model: str, text: str, max_tokens: int) -> int:
+    return count_tokens(model, text) + max_tokens
+
+# Custom exception for an invalid API key or an unreachable API
+class APIKeyException(Exception):
+    def __init__(self, message="OpenAI API key could not be verified"):
+        self.message = message
+        super().__init__(self.message)
+
 # Function to check if the API key is valid
 def check_api_key_validity() -> bool:
+    try:
+        ensure_api_key_valid()
+        print("API key is valid. Proceeding with the task...")
+        return True
+    except APIKeyException as e:
+        print(f"Error: {e.message}")
+        return False
+
+# The key is checked lazily, on the first processing run, rather than with a
+# blocking network call at import time
+_API_KEY_CHECKED = False
+
+# Raises APIKeyException if the key is rejected or the API can't be reached
+@api_retry
+def _list_models() -> Any:
+    return get_openai_client().models.list()
+
+def ensure_api_key_valid() -> None:
+    global _API_KEY_CHECKED
+    if _API_KEY_CHECKED:
+        return
     try:
         # Test the API key by making a simple API call
-        response = client.models.list()
-        if response:
-            print("API key is valid. Proceeding with the task...")
-            return True
+        _list_models()
     except openai.AuthenticationError:
-        print("Error: The API key is invalid. Please check your API key and try again.")
-        return False
+        raise APIKeyException("The OpenAI API key is invalid. Please check your API key and try again.")
     except Exception as e:
-        print(f"Unexpected error: {str(e)}")
-        return False
+        raise APIKeyException(f"Could not reach the OpenAI API to verify the API key: {str(e)}")
+    _API_KEY_CHECKED = True
 
 # Updated key maps to maintain keys as specified in English
 KEY_MAPS = {
@@ -68,81 +252,262 @@ FALLBACK_KEYS = {
     "difficulty": ["Difficulty", "difficulty"]
 }
 
-# Normalize keys to handle different cases or accents
+# Normalize keys to handle different cases or accents. The set of distinct keys is
+# small, so results are cached and repeated keys cost a dict lookup.
+@functools.lru_cache(maxsize=1024)
 def normalize_key(key: str) -> str:
     return unicodedata.normalize("NFKC", key.strip().lower())
 
+# Normalized forms of the known keys, computed once at import instead of per record
+NORMALIZED_KEY_MAP = {eng: normalize_key(local) for eng, local in KEY_MAPS["English"].items()}
+NORMALIZED_FALLBACKS = {eng: [normalize_key(k) for k in alts] for eng, alts in FALLBACK_KEYS.items()}
+KNOWN_NORMALIZED_KEYS = frozenset(NORMALIZED_KEY_MAP.values()).union(*NORMALIZED_FALLBACKS.values())
+
 # Get the key map for a language
 def get_key_map_for_language(language: str) -> Dict[str, str]:
     return KEY_MAPS.get("English", KEY_MAPS["English"])
 
-# Map the record fields based on key maps
-def map_record_fields(record: Dict[str, Any], key_map: Dict[str, str]) -> Dict[str, Any]:
-    normalized_record = {normalize_key(k): v for k, v in record.items()}
+# Normalize the record keys we know about, stopping once all of them have been found
+def normalize_record_keys(record: Dict[str, Any]) -> Dict[str, Any]:
+    normalized_record = {}
+    for k, v in record.items():
+        nk = normalize_key(k)
+        if nk in KNOWN_NORMALIZED_KEYS:
+            normalized_record[nk] = v
+            if len(normalized_record) == len(KNOWN_NORMALIZED_KEYS):
+                break
+    return normalized_record
+
+# Map the record fields (already passed through normalize_record_keys) to English keys
+def map_record_fields(normalized_record: Dict[str, Any]) -> Dict[str, Any]:
     mapped = {}
-    for eng_key, local_key in key_map.items():
-        val = normalized_record.get(normalize_key(local_key), "")
+    for eng_key, local_key in NORMALIZED_KEY_MAP.items():
+        val = normalized_record.get(local_key, "")
         if not val:
-            for alt_key in FALLBACK_KEYS.get(eng_key, []):
-                if normalize_key(alt_key) in normalized_record:
-                    val = normalized_record[normalize_key(alt_key)]
+            for alt_key in NORMALIZED_FALLBACKS.get(eng_key, []):
+                if alt_key in normalized_record:
+                    val = normalized_record[alt_key]
                     break
         mapped[eng_key] = val
     return mapped
 
-# Construct system prompt for OpenAI API based on question type
+# Static system prompt shared by every validation request. Question-type guidance is
+# appended at the end so all requests share the longest possible prefix, which is
+# what OpenAI's automatic prompt caching matches on.
+BASE_SYSTEM_PROMPT = (
+    "You are an expert educator, grader, and language expert specializing in mathematics, physics, and theoretical subjects. "
+    "Your task is to evaluate the correctness of a given question and its provided answer in any language, including but not limited to English, Spanish, French, Chinese, Arabic, Russian, Hindi, and others. "
+    "Follow these steps precisely, regardless of the language:\n"
+    "1. Assess the provided answer for accuracy based on the given question. Ensure to check for logical consistency, correctness in mathematical or scientific reasoning, and clarity in the language used.\n"
+    "2. If the answer is incorrect or lacks completeness, provide a detailed correction. Ensure that the **Explanation** contains the step-by-step process to solve the problem, while the **Answer** is the final, correct solution. Make sure to preserve the technical rigor and conceptual clarity while correcting, but write it in a natural, conversational tone as if you were explaining it to a student.\n"
+    "3. Identify any ambiguous language or missing information in the answer. If the question involves mathematical or scientific formulas, preserve and correct them with exact LaTeX formatting.\n"
+    "4. If needed, clarify the wording of the answer to ensure it is precise and unambiguous, without altering the meaning or changing the core content.\n"
+    "5. Consider linguistic nuances in different languages and ensure that translations or explanations respect the integrity of the original content. Adapt your reasoning style to the conventions and standards of each language used in the question and answer.\n"
+    "6. If the answer includes any mathematical or scientific symbols, LaTeX expressions, or formulas, preserve them exactly and correct only when necessary.\n"
+    "Return valid JSON ONLY, in the following format:\n"
+    "{\"valid\": bool, \"reason\": str, \"corrected_answer\": str or null, \"corrected_explanation\": str or null}\n"
+    "- \"valid\": True if the answer is correct, False if it's not.\n"
+    "- \"reason\": Provide a clear explanation of why the answer is correct or incorrect. Be as specific as possible, pointing out any errors in logic, calculation, or phrasing.\n"
+    "- \"corrected_answer\": Provide the corrected final answer if the original answer was wrong. If the answer was correct, this should be null.\n"
+    "- \"corrected_explanation\": Provide the corrected explanation if the original explanation was wrong. If the explanation was correct, this should be null.\n"
+    "Ensure that your reasoning is clear, concise, and well-structured. If corrections are needed, provide a complete and accurate solution. Always preserve the original intent and meaning of the answer while making corrections, but write in a natural, human-like tone as if you're talking to a student."
+)
+
+QUESTION_TYPE_SUFFIXES = {
+    "explanation": " The answer should be a detailed explanation in a conversational and clear style.",
+    "short answer": " The answer should be concise, precise, and natural.",
+    "multiple choice": " The answer must be one of the provided options. Verify correctness in a natural, human-like manner.",
+    "true/false": " The answer must be either 'True' or 'False', explained in a simple, human-like way.",
+    "": " The answer type is unspecified; check for correctness in a conversational style."
+}
+QUESTION_TYPE_ALIASES = {"exp": "explanation", "short": "short answer", "mcq": "multiple choice", "truefalse": "true/false"}
+
+# Prompts are built once at import so every request for a question type sends byte-identical text
+SYSTEM_PROMPTS = {qt: BASE_SYSTEM_PROMPT + suffix for qt, suffix in QUESTION_TYPE_SUFFIXES.items()}
+
+# Get the system prompt for OpenAI API based on question type
 def get_system_prompt(question_type: str) -> str:
-    base = (
-        "You are an expert educator, grader, and language expert specializing in mathematics, physics, and theoretical subjects. "
-        "Your task is to evaluate the correctness of a given question and its provided answer in any language, including but not limited to English, Spanish, French, Chinese, Arabic, Russian, Hindi, and others. "
-        "Follow these steps precisely, regardless of the language:\n"
-        "1. Assess the provided answer for accuracy based on the given question. Ensure to check for logical consistency, correctness in mathematical or scientific reasoning, and clarity in the language used.\n"
-        "2. If the answer is incorrect or lacks completeness, provide a detailed correction. Ensure that the **Explanation** contains the step-by-step process to solve the problem, while the **Answer** is the final, correct solution. Make sure to preserve the technical rigor and conceptual clarity while correcting, but write it in a natural, conversational tone as if you were explaining it to a student.\n"
-        "3. Identify any ambiguous language or missing information in the answer. If the question involves mathematical or scientific formulas, preserve and correct them with exact LaTeX formatting.\n"
-        "4. If needed, clarify the wording of the answer to ensure it is precise and unambiguous, without altering the meaning or changing the core content.\n"
-        "5. Consider linguistic nuances in different languages and ensure that translations or explanations respect the integrity of the original content. Adapt your reasoning style to the conventions and standards of each language used in the question and answer.\n"
-        "6. If the answer includes any mathematical or scientific symbols, LaTeX expressions, or formulas, preserve them exactly and correct only when necessary.\n"
-        "Return valid JSON ONLY, in the following format:\n"
-        "{\"valid\": bool, \"reason\": str, \"corrected_answer\": str or null, \"corrected_explanation\": str or null}\n"
-        "- \"valid\": True if the answer is correct, False if it's not.\n"
-        "- \"reason\": Provide a clear explanation of why the answer is correct or incorrect. Be as specific as possible, pointing out any errors in logic, calculation, or phrasing.\n"
-        "- \"corrected_answer\": Provide the corrected final answer if the original answer was wrong. If the answer was correct, this should be null.\n"
-        "- \"corrected_explanation\": Provide the corrected explanation if the original explanation was wrong. If the explanation was correct, this should be null.\n"
-        "Ensure that your reasoning is clear, concise, and well-structured. If corrections are needed, provide a complete and accurate solution. Always preserve the original intent and meaning of the answer while making corrections, but write in a natural, human-like tone as if you're talking to a student."
+    qt = str(question_type).lower()
+    qt = QUESTION_TYPE_ALIASES.get(qt, qt)
+    return SYSTEM_PROMPTS.get(qt, SYSTEM_PROMPTS[""])
+
+# Build chat messages, with an optional system prompt
+def build_messages(system: Optional[str], user: str) -> List[Dict[str, str]]:
+    messages = [{"role": "system", "content": system}] if system else []
+    messages.append({"role": "user", "content": user})
+    return messages
+
+# Tracks the brace depth of a streamed JSON object, ignoring braces inside strings,
+# so the stream can be closed as soon as the top-level object is complete
+class JsonObjectTracker:
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    # Returns the offset just past the closing brace if the object ends in this chunk, else -1
+    def feed(self, text: str) -> int:
+        for i, ch in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    return i + 1
+        return -1
+
+# Append the text of a stream chunk; returns True once the JSON object is complete
+def _consume_chunk(chunk: Any, parts: List[str], tracker: Optional[JsonObjectTracker]) -> bool:
+    if not chunk.choices:
+        return False
+    delta = chunk.choices[0].delta.content or ""
+    if tracker is not None:
+        end = tracker.feed(delta)
+        if end >= 0:
+            parts.append(delta[:end])
+            return True
+    parts.append(delta)
+    return False
+
+# Minimum seconds between on_progress updates while streaming
+PROGRESS_INTERVAL = 0.1
+
+# Stream a chat completion. In JSON mode the stream is closed right after the closing
+# brace instead of waiting for the end of generation. on_progress, if given, receives
+# the text received so far at most every PROGRESS_INTERVAL seconds and once at the end
+# (and starts over if a retry happens).
+@api_retry
+def _chat(model: str, system: Optional[str], user: str, temperature: float, max_tokens: int,
+          json_mode: bool = False, on_progress: Optional[Callable[[str], None]] = None) -> str:
+    stream = get_openai_client().chat.completions.create(
+        model=model,
+        temperature=temperature,
+        messages=build_messages(system, user),
+        max_tokens=max_tokens,
+        response_format={"type": "json_object"} if json_mode else openai.NOT_GIVEN,
+        timeout=REQUEST_TIMEOUT,
+        stream=True
+    )
+    parts = []
+    tracker = JsonObjectTracker() if json_mode else None
+    last_progress = time.monotonic()
+    try:
+        for chunk in stream:
+            if _consume_chunk(chunk, parts, tracker):
+                break
+            if on_progress is not None and time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                on_progress("".join(parts))
+                last_progress = time.monotonic()
+    finally:
+        stream.close()
+    raw = "".join(parts)
+    if on_progress is not None:
+        on_progress(raw)
+    return raw
+
+# Memoize chat completions on (model, system, user, temperature, max_tokens, json_mode) so that
+# repeated values (discipline, competition name, ...) cost a single API request.
+# Errors are not cached, so failed calls are retried on the next lookup. A plain bounded
+# dict (rather than lru_cache) is shared by the sync and async paths, since lru_cache
+# can't memoize coroutines and the streaming path needs to look up and store explicitly.
+CHAT_CACHE_SIZE = 4096
+_chat_cache: Dict[tuple, str] = {}
+# Every Streamlit session's script thread shares the cache, so updates are serialized
+_chat_cache_lock = threading.Lock()
+
+def _cache_put(key: tuple, raw: str) -> None:
+    with _chat_cache_lock:
+        if len(_chat_cache) >= CHAT_CACHE_SIZE:
+            _chat_cache.pop(next(iter(_chat_cache)))  # Evict the oldest entry
+        _chat_cache[key] = raw
+
+def _cached_chat(model: str, system: Optional[str], user: str, temperature: float, max_tokens: int,
+                 json_mode: bool = False, on_progress: Optional[Callable[[str], None]] = None) -> str:
+    key = (model, system, user, temperature, max_tokens, json_mode)
+    raw = _chat_cache.get(key)  # A single lookup, so a concurrent eviction can't race it
+    if raw is not None:
+        if on_progress is not None:
+            on_progress(raw)
+        return raw
+    raw = _chat(model, system, user, temperature, max_tokens, json_mode, on_progress)
+    _cache_put(key, raw)
+    return raw
+
+@api_retry
+async def _chat_async(async_client: openai.AsyncOpenAI, model: str, system: Optional[str], user: str,
+                      temperature: float, max_tokens: int, json_mode: bool = False) -> str:
+    if quota_exceeded_event.is_set():
+        raise QuotaExceededException("OpenAI API quota exceeded; skipping pending request")
+    limiter = get_rate_limiter(model)
+    if limiter is not None:
+        await limiter.acquire(estimate_tokens(model, (system or "") + user, max_tokens))
+    stream = await async_client.chat.completions.create(
+        model=model,
+        temperature=temperature,
+        messages=build_messages(system, user),
+        max_tokens=max_tokens,
+        response_format={"type": "json_object"} if json_mode else openai.NOT_GIVEN,
+        timeout=REQUEST_TIMEOUT,
+        stream=True
     )
+    parts = []
+    tracker = JsonObjectTracker() if json_mode else None
+    try:
+        async for chunk in stream:
+            if _consume_chunk(chunk, parts, tracker):
+                break
+    finally:
+        await stream.close()
+    return "".join(parts)
 
-    qt = question_type.lower()
-    if qt in ("explanation", "exp"): return base + " The answer should be a detailed explanation in a conversational and clear style."
-    elif qt in ("short answer", "short"): return base + " The answer should be concise, precise, and natural."
-    elif qt in ("multiple choice", "mcq"): return base + " The answer must be one of the provided options. Verify correctness in a natural, human-like manner."
-    elif qt in ("true/false", "truefalse"): return base + " The answer must be either 'True' or 'False', explained in a simple, human-like way."
-    else: return base + " The answer type is unspecified; check for correctness in a conversational style."
+async def _cached_chat_async(async_client: openai.AsyncOpenAI, model: str, system: Optional[str], user: str,
+                             temperature: float, max_tokens: int, json_mode: bool = False) -> str:
+    key = (model, system, user, temperature, max_tokens, json_mode)
+    raw = _chat_cache.get(key)
+    if raw is not None:
+        return raw
+    raw = await _chat_async(async_client, model, system, user, temperature, max_tokens, json_mode)
+    _cache_put(key, raw)
+    return raw
 
-# Extract JSON string from OpenAI response
-def extract_json_substring(s: str) -> str:
-    start = s.find("{")
-    end = s.rfind("}")
-    return s[start:end+1] if start != -1 and end != -1 and end > start else s
+# A verdict is usable when it states validity and gives a reason
+def is_confident_result(result: Any) -> bool:
+    return isinstance(result, dict) and "valid" in result and bool(str(result.get("reason") or "").strip())
 
 # Make the OpenAI API call to check the validity of answers
-def call_openai(question: str, answer: str, question_type: str) -> Dict[str, Any]:
+async def call_openai_async(async_client: openai.AsyncOpenAI, question: str, answer: str, question_type: str) -> Dict[str, Any]:
     system_prompt = get_system_prompt(question_type)
     prompt = f"Question:\n{question}\n\nAnswer:\n{answer}"
     try:
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            temperature=0.8,
-            messages=[{"role":"system","content":system_prompt},{"role":"user","content":prompt}],
-            max_tokens=2000
-        )
-        raw = response.choices[0].message.content
-        json_text = extract_json_substring(raw)
-        try: result = json.loads(json_text)
-        except json.JSONDecodeError: result = json5.loads(json_text)
+        result = None
+        for model in dict.fromkeys((FAST_MODEL, STRONG_MODEL)):
+            # JSON mode guarantees a parseable object unless the reply hits max_tokens;
+            # verdicts rarely need more than a few hundred tokens
+            raw = await _cached_chat_async(async_client, model, system_prompt, prompt, 0.8, VALIDATION_MAX_TOKENS, True)
+            try:
+                result = load_json_bytes(raw)
+            except json.JSONDecodeError:
+                continue
+            if is_confident_result(result):
+                return result
+        if result is None:
+            return {"valid": False, "reason": "OpenAI API error: response was not valid JSON", "corrected_answer": None}
         return result
+    except QuotaExceededException:
+        raise
     except openai.RateLimitError as e:
         error_msg = str(e)
-        if 'insufficient_quota' in error_msg.lower() or 'quota' in error_msg.lower():
+        if is_quota_error(e):
+            quota_exceeded_event.set()
             raise QuotaExceededException(f"OpenAI API quota exceeded: {error_msg}")
         else:
             return {"valid": False, "reason": f"Rate limit error: {error_msg}", "corrected_answer": None}
@@ -152,146 +517,326 @@ def call_openai(question: str, answer: str, question_type: str) -> Dict[str, Any
         return {"valid": False, "reason": f"OpenAI API error: {str(e)}", "corrected_answer": None}
 
 # Function to validate and process a record
-def validate_record(record: Dict[str, Any]) -> Dict[str, Any]:
+async def validate_record_async(async_client: openai.AsyncOpenAI, record: Dict[str, Any]) -> Dict[str, Any]:
     lang = "English"
-    normalized_record = {normalize_key(k): v for k, v in record.items()}
-    for possible_lang_key in FALLBACK_KEYS["language"]:
-        if normalize_key(possible_lang_key) in normalized_record:
-            lang = normalized_record[normalize_key(possible_lang_key)]
+    normalized_record = normalize_record_keys(record)
+    for possible_lang_key in NORMALIZED_FALLBACKS["language"]:
+        if possible_lang_key in normalized_record:
+            lang = normalized_record[possible_lang_key]
             break
 
     key_map = get_key_map_for_language(lang)
-    mapped = map_record_fields(record, key_map)
+    mapped = map_record_fields(normalized_record)
     question = mapped.get("question", "")
     answer = mapped.get("answer", "")
     question_type = mapped.get("question_type", "unspecified")
 
     try:
-        result = call_openai(question, answer, question_type)
-        new_rec = record.copy()
-
+        result = await call_openai_async(async_client, question, answer, question_type)
+        # Collect the changes first and merge once, instead of copying the record
+        # and then growing it key by key
+        updates = {}
         if result.get("valid", False):
-            new_rec["_validation"] = {"valid": True, "reason": result.get("reason")}
-            new_rec["explanation_status"] = "Answer is correct."
+            updates["_validation"] = {"valid": True, "reason": result.get("reason")}
+            updates["explanation_status"] = "Answer is correct."
         else:
             # Replace the incorrect answer and explanation with the corrected ones
             if result.get("corrected_answer"):
-                new_rec[key_map["answer"]] = result["corrected_answer"]
-                new_rec["explanation_status"] = "Answer corrected by AI."
+                updates[key_map["answer"]] = result["corrected_answer"]
+                updates["explanation_status"] = "Answer corrected by AI."
             if result.get("corrected_explanation"):
-                new_rec[key_map["explanation"]] = result["corrected_explanation"]
+                updates[key_map["explanation"]] = result["corrected_explanation"]
             else:
-                new_rec["explanation_status"] = "Explanation is already correct."
-            new_rec["_validation"] = {"valid": False, "reason": result.get("reason"), "corrected": True}
+                updates["explanation_status"] = "Explanation is already correct."
+            updates["_validation"] = {"valid": False, "reason": result.get("reason"), "corrected": True}
 
-        return new_rec
+        return {**record, **updates}
     except QuotaExceededException:
         # Re-raise quota exception to be caught at higher level
         raise
 
-def gpt_translate_text(text_record: Dict[str, Any], target_language: str = "English") -> Dict[str, Any]:
+# Key under which the _validation reason is sent alongside the record fields
+REASON_SENTINEL = "__validation_reason__"
+
+# Collect the string values of a record that should be translated
+def get_translatable_fields(record: Dict[str, Any]) -> Dict[str, str]:
+    # explanation_status is already in English
+    fields = {k: v for k, v in record.items() if isinstance(v, str) and v.strip() and k != "explanation_status"}
+    validation = record.get("_validation")
+    if isinstance(validation, dict) and isinstance(validation.get("reason"), str) and validation["reason"].strip():
+        fields[REASON_SENTINEL] = validation["reason"]
+    return fields
+
+# Build a single translation prompt covering every field of a record
+def get_record_translation_prompt(fields: Dict[str, str], target_language: str) -> str:
+    return (
+        f"Translate the values in this JSON object into {target_language}. "
+        f"Preserve LaTeX, numbers, formatting and keys. "
+        f"Do not translate proper nouns unless needed. Return JSON only.\n\n"
+        + json.dumps(fields, ensure_ascii=False)
+    )
+
+# Merge translated values back into a copy of the record; missing values stay untranslated
+def merge_translation(record: Dict[str, Any], fields: Dict[str, str], translated: Dict[str, Any]) -> Dict[str, Any]:
+    new_rec = dict(record)
+    for key in fields:
+        value = translated.get(key)
+        if not isinstance(value, str):
+            continue
+        if key == REASON_SENTINEL:
+            new_rec["_validation"] = {**record["_validation"], "reason": value}
+        else:
+            new_rec[key] = value
+    return new_rec
+
+# Output budget for translating a record: roughly twice the input tokens, since some
+# languages expand on translation, capped at TRANSLATION_MAX_TOKENS
+def get_translation_max_tokens(prompt: str) -> int:
+    return min(TRANSLATION_MAX_TOKENS, 2 * count_tokens(FAST_MODEL, prompt) + 64)
+
+def gpt_translate_text(text_record: Dict[str, Any], target_language: str = "English",
+                       on_progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
     """
     Translate only the values of a JSON record to the target language.
     Keys remain in English exactly as specified in KEY_MAPS.
+    All fields, including the validation reason, are sent in one JSON-mode request.
+    If on_progress is given, it is called with the partial response as it streams in
+    (or once with the cached response).
     """
-    translated_record = {}
-    for key, value in text_record.items():
-        # Handle _validation metadata specially - translate the reason but keep structure
-        if key == "_validation" and isinstance(value, dict):
-            translated_validation = {}
-            for val_key, val_value in value.items():
-                if val_key == "reason" and isinstance(val_value, str) and val_value.strip():
-                    # Translate the validation reason
-                    try:
-                        prompt = (
-                            f"Translate the following validation reason into {target_language}. "
-                            f"Keep technical terms and maintain the professional tone. "
-                            f"Do not change formatting, numbers, or LaTeX.\n\n"
-                            f"Text: {val_value}"
-                        )
-                        response = client.chat.completions.create(
-                            model=MODEL_NAME,
-                            temperature=0.5,
-                            messages=[{"role": "user", "content": prompt}],
-                            max_tokens=1000
-                        )
-                        translated_reason = response.choices[0].message.content.strip()
-                        translated_validation[val_key] = translated_reason
-                    except openai.RateLimitError as e:
-                        error_msg = str(e)
-                        if 'insufficient_quota' in error_msg.lower() or 'quota' in error_msg.lower():
-                            raise QuotaExceededException(f"Translation quota exceeded: {error_msg}")
-                        else:
-                            print(f"Rate limit error translating validation reason: {e}")
-                            translated_validation[val_key] = val_value  # Keep original
-                    except Exception as e:
-                        print(f"Error translating validation reason: {e}")
-                        translated_validation[val_key] = val_value  # Keep original
-                else:
-                    # Keep other validation fields as is (valid, corrected flags)
-                    translated_validation[val_key] = val_value
-            translated_record[key] = translated_validation
-            continue
+    fields = get_translatable_fields(text_record)
+    if not fields:
+        return dict(text_record)
 
-        # Keep explanation_status as is (it's already in English)
-        if key == "explanation_status":
-            translated_record[key] = value
-            continue
+    try:
+        prompt = get_record_translation_prompt(fields, target_language)
+        max_tokens = get_translation_max_tokens(prompt)
+        raw = _cached_chat(FAST_MODEL, None, prompt, 0.5, max_tokens, True, on_progress)
+        translated = load_json_bytes(raw)
+    except openai.RateLimitError as e:
+        error_msg = str(e)
+        if is_quota_error(e):
+            raise QuotaExceededException(f"Translation quota exceeded: {error_msg}")
+        else:
+            print(f"Rate limit error translating record: {e}")
+            return dict(text_record)
+    except openai.AuthenticationError as e:
+        print(f"Authentication error: {e}")
+        raise QuotaExceededException(f"Authentication error during translation: {str(e)}")
+    except Exception as e:
+        print(f"Error translating record: {e}")
+        return dict(text_record)
+
+    return merge_translation(text_record, fields, translated)
+
+@api_retry
+def _retrieve_batch(batch_id: str) -> Any:
+    return get_openai_client().batches.retrieve(batch_id)
+
+@api_retry
+def _download_file_text(file_id: str) -> str:
+    return get_openai_client().files.content(file_id).text
 
-        # If value is empty or non-string, keep as is
-        if not isinstance(value, str) or value.strip() == "":
-            translated_record[key] = value
+@api_retry
+def _upload_batch_file(payload: bytes) -> Any:
+    return get_openai_client().files.create(file=("translations.jsonl", payload), purpose="batch")
+
+@api_retry
+def _create_batch(input_file_id: str) -> Any:
+    return get_openai_client().batches.create(
+        input_file_id=input_file_id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+
+def translate_records_batch(records: List[Dict[str, Any]], target_language: str = "English",
+                            poll_interval: int = 30) -> List[Dict[str, Any]]:
+    """
+    Translate the values of many records through the OpenAI Batch API.
+    Every record becomes one line of a JSONL batch file; results are stitched
+    back by custom_id. Cheaper than gpt_translate_text, but may take up to 24h.
+    Records whose translation failed are kept in the original language. A job
+    interrupted by an error or reload is resumed on the next call with the same records.
+    """
+    translated = [dict(rec) for rec in records]
+    all_fields = [get_translatable_fields(rec) for rec in records]
+
+    lines = []
+    for i, fields in enumerate(all_fields):
+        if not fields:
             continue
+        prompt = get_record_translation_prompt(fields, target_language)
+        lines.append(json.dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": FAST_MODEL,
+                "temperature": 0.5,
+                "messages": build_messages(None, prompt),
+                "max_tokens": get_translation_max_tokens(prompt),
+                "response_format": {"type": "json_object"}
+            }
+        }, ensure_ascii=False))
+    if not lines:
+        return translated
+
+    # The batch id is saved under a hash of the request file, so a reload while the
+    # job runs resumes polling the same (already paid for) batch instead of resubmitting
+    payload = "\n".join(lines).encode("utf-8")
+    batch_id_path = os.path.join(CHECKPOINT_DIR, f"batch-{hashlib.sha256(payload).hexdigest()}.id")
 
+    try:
+        batch = None
+        if os.path.exists(batch_id_path):
+            with open(batch_id_path, "r", encoding="utf-8") as f:
+                saved_id = f.read().strip()
+            try:
+                batch = _retrieve_batch(saved_id)
+            except openai.NotFoundError:
+                # Stale id (e.g. created with another API key); submit a fresh job
+                os.remove(batch_id_path)
+        if batch is None:
+            batch_file = _upload_batch_file(payload)
+            batch = _create_batch(batch_file.id)
+            os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+            with open(batch_id_path, "w", encoding="utf-8") as f:
+                f.write(batch.id)
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(poll_interval)
+            batch = _retrieve_batch(batch.id)
+
+        # The job has finished one way or another; don't resume it again
+        os.remove(batch_id_path)
+        if not batch.output_file_id:
+            print(f"Batch translation {batch.id} ended with status {batch.status}")
+            return translated
+        output = _download_file_text(batch.output_file_id)
+    except openai.RateLimitError as e:
+        error_msg = str(e)
+        if is_quota_error(e):
+            raise QuotaExceededException(f"Translation quota exceeded: {error_msg}")
+        print(f"Rate limit error during batch translation: {e}")
+        return translated
+    except openai.AuthenticationError as e:
+        print(f"Authentication error: {e}")
+        raise QuotaExceededException(f"Authentication error during translation: {str(e)}")
+    except Exception as e:
+        print(f"Error during batch translation: {e}")
+        return translated
+
+    # Stitch results back by custom_id
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        entry = load_json_bytes(line)
+        response = entry.get("response") or {}
+        if response.get("status_code") != 200:
+            print(f"Error translating record {entry.get('custom_id')}: {entry.get('error')}")
+            continue
+        idx = int(entry["custom_id"])
         try:
-            # Translate the value
-            prompt = (
-                f"Translate the following text into {target_language}. "
-                f"Do not change formatting, numbers, or LaTeX. "
-                f"Do not translate proper nouns unless needed.\n\n"
-                f"Text: {value}"
-            )
-            response = client.chat.completions.create(
-                model=MODEL_NAME,
-                temperature=0.5,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=2000
-            )
-            translated_text = response.choices[0].message.content.strip()
-            translated_record[key] = translated_text
-        except openai.RateLimitError as e:
-            error_msg = str(e)
-            if 'insufficient_quota' in error_msg.lower() or 'quota' in error_msg.lower():
-                raise QuotaExceededException(f"Translation quota exceeded: {error_msg}")
-            else:
-                print(f"Rate limit error for key {key}: {e}")
-                time.sleep(60)  # Wait 1 minute before continuing
-                translated_record[key] = value
-        except openai.AuthenticationError as e:
-            print(f"Authentication error: {e}")
-            raise QuotaExceededException(f"Authentication error during translation: {str(e)}")
-        except Exception as e:
-            print(f"Error translating key {key}: {e}")
-            translated_record[key] = value
-
-    return translated_record
-
-# Process records in parallel to speed up validation
-def process_records_parallel(records: List[Dict[str, Any]], max_workers: int = 5) -> List[Dict[str, Any]]:
-    results = [None]*len(records)
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(validate_record, rec): i for i, rec in enumerate(records)}
-        for future in concurrent.futures.as_completed(futures):
-            idx = futures[future]
+            result = load_json_bytes(response["body"]["choices"][0]["message"]["content"])
+        except json.JSONDecodeError as e:
+            print(f"Error parsing translation for record {idx}: {e}")
+            continue
+        translated[idx] = merge_translation(records[idx], all_fields[idx], result)
+
+    return translated
+
+# Completed records are checkpointed to a JSONL file per input file, so a run that
+# stops (quota exceeded, tab reload) resumes where it left off
+CHECKPOINT_DIR = ".checkpoints"
+
+def get_checkpoint_path(file_bytes: bytes) -> str:
+    return os.path.join(CHECKPOINT_DIR, f"{hashlib.sha256(file_bytes).hexdigest()}.jsonl")
+
+# Read checkpointed records as {index: record}; a truncated last line is ignored
+def load_checkpoint(path: Optional[str]) -> Dict[int, Dict[str, Any]]:
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, "rb") as f:
+        for line in f:
             try:
-                results[idx] = future.result()
-            except QuotaExceededException:
-                # Cancel remaining futures and re-raise
-                for f in futures:
-                    f.cancel()
-                raise
-    return results
-
-# Ensure API key validity before continuing
-if not check_api_key_validity():
-    exit(1)  # Stop the program if API key is invalid
\ No newline at end of file
+                entry = load_json_bytes(line)
+            except json.JSONDecodeError:
+                continue
+            done[entry["index"]] = entry["record"]
+    return done
+
+def append_checkpoint(path: Optional[str], idx: int, rec: Dict[str, Any]) -> None:
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "ab") as f:
+        f.write(dump_json_bytes({"index": idx, "record": rec}, indent=False) + b"\n")
+
+def discard_checkpoint(path: Optional[str]) -> None:
+    if path and os.path.exists(path):
+        os.remove(path)
+
+# Reasons call_openai_async uses when it couldn't get a verdict from the model
+API_ERROR_PREFIXES = ("Rate limit error:", "Authentication error:", "OpenAI API error:")
+
+# True when a validated record carries an API error fallback rather than a real verdict
+def is_api_error_record(rec: Dict[str, Any]) -> bool:
+    reason = (rec.get("_validation") or {}).get("reason")
+    return isinstance(reason, str) and reason.startswith(API_ERROR_PREFIXES)
+
+# Validate records concurrently and yield (index, record) as each one completes,
+# so callers can show progress without waiting for the whole set
+async def iter_processed(records: List[Dict[str, Any]], max_workers: int = 20,
+                         checkpoint_path: Optional[str] = None) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    # Only real verdicts are checkpointed, so API errors are retried on the next run.
+    # The checkpoint is left in place; callers discard it once the validated records
+    # are safely stored (i.e. after translation), so a crash in between loses nothing.
+    done = load_checkpoint(checkpoint_path)
+    for idx, rec in done.items():
+        yield idx, rec
+    if len(done) >= len(records):
+        return
+
+    ensure_api_key_valid()
+    quota_exceeded_event.clear()
+    sem = asyncio.Semaphore(max_workers)
+    # One async client per event loop; its connection pool is bound to the loop
+    async with openai.AsyncOpenAI(max_retries=0) as async_client:
+        async def bound(idx: int, rec: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+            async with sem:
+                new_rec = await validate_record_async(async_client, rec)
+            if not is_api_error_record(new_rec):
+                append_checkpoint(checkpoint_path, idx, new_rec)
+            return idx, new_rec
+
+        tasks = [asyncio.ensure_future(bound(i, rec)) for i, rec in enumerate(records) if i not in done]
+        try:
+            for future in asyncio.as_completed(tasks):
+                yield await future
+        finally:
+            # Stop outstanding work if the consumer bails out (e.g. quota exceeded), and
+            # wait for it to unwind before the client closes underneath in-flight requests
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+# Count valid, corrected and failed records in a single pass
+def summarize_results(processed: List[Dict[str, Any]]) -> Tuple[int, int, int]:
+    valid = corrected = failed = 0
+    for r in processed:
+        v = r.get("_validation") or {}
+        if v.get("valid") is True: valid += 1
+        if v.get("corrected") is True: corrected += 1
+        if not v.get("valid", False) and not v.get("corrected", False): failed += 1
+    return valid, corrected, failed
+
+# Validate all records and return them in input order; built on iter_processed so
+# concurrency, checkpointing and cancellation live in one place
+def process_records_parallel(records: List[Dict[str, Any]], max_workers: int = 20,
+                             checkpoint_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    async def run_all() -> List[Dict[str, Any]]:
+        results = [None]*len(records)
+        async for idx, rec in iter_processed(records, max_workers, checkpoint_path):
+            results[idx] = rec
+        return results
+
+    return asyncio.run(run_all())
@@ -1,10 +1,10 @@
 import json
 import time
-from chatbot_setup import process_records_parallel, gpt_translate_text
+from chatbot_setup import process_records_parallel, gpt_translate_text, summarize_results, load_json_bytes, get_checkpoint_path, discard_checkpoint, is_api_error_record, APIKeyException
 
 def load_json_file(file_path: str):
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    with open(file_path, "rb") as f:
+        data = load_json_bytes(f.read())
         if isinstance(data, dict):
             data = [data]
         return data
@@ -16,6 +16,8 @@ def save_json_file(data, file_path: str):
 def main():
     input_file = input("Enter path to input JSON file: ").strip()
     data = load_json_file(input_file)
+    with open(input_file, "rb") as f:
+        checkpoint_path = get_checkpoint_path(f.read())
     
     print(f"Loaded {len(data)} records.")
     
@@ -23,7 +25,11 @@ def main():
     
     # Process records
     print("Processing records...")
-    processed = process_records_parallel(data, max_workers=5)
+    try:
+        processed = process_records_parallel(data, checkpoint_path=checkpoint_path)
+    except APIKeyException as e:
+        print(f"Error: {e.message}")
+        return
     
     # Translate to English
     print("Translating to English...")
@@ -33,9 +39,7 @@ def main():
     print(f"Processing completed in {elapsed:.2f} seconds.")
     
     # Summary
-    valid = sum(1 for r in processed if r.get("_validation", {}).get("valid") is True)
-    corrected = sum(1 for r in processed if r.get("_validation", {}).get("corrected") is True)
-    failed = sum(1 for r in processed if not r.get("_validation", {}).get("valid", False) and not r.get("_validation", {}).get("corrected", False))
+    valid, corrected, failed = summarize_results(processed)
     
     print("Summary:")
     print(f"Total records: {len(processed)}")
@@ -49,5 +53,10 @@ def main():
     
     print("Output files saved as 'corrected.json' and 'corrected_en.json'.")
 
+    # Both outputs are on disk; keep the checkpoint only if some records still need
+    # another validation attempt
+    if not any(is_api_error_record(r) for r in processed):
+        discard_checkpoint(checkpoint_path)
+
 if __name__ == "__main__":
     main()